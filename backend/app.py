@@ -1,203 +1,251 @@
 """
-Sign Language Recognition Service (Flask)
+Sign Language Recognition Service (Starlette/uvicorn)
 - MediaPipe for hand detection
 - TensorFlow/Keras model for ISL alphabet recognition (landmark-based)
 - Live sentence builder per client (temporal smoothing, commit rules, simple word correction)
+Model loading, MediaPipe and landmark extraction live in inference_core (shared with sign_language_service.py).
+
+Run with: uvicorn app:app --workers 1 --http h11 --port 5000  (or python app.py)
 """
 
 import os
 import sys
-import json
+import asyncio
 import base64
+import struct
 import time
 import uuid
-from collections import deque, defaultdict
-from typing import List, Tuple
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 
 import numpy as np
 import cv2
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import tensorflow as tf
-from tensorflow import keras
-
-# Try import mediapipe
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import inference_core as core
+from inference_core import (
+    MODELS_DIR,
+    MAX_BATCH_SIZE,
+    classify,
+    extract_hand_landmarks_from_image_bgr,
+    select_model_features,
+)
+
+# numba is optional: without it majority_vote uses the dict-based implementation
 try:
-    import mediapipe as mp
-except Exception as e:
-    print("ERROR: mediapipe is not installed. Run: pip install mediapipe opencv-python")
-    raise
+    from numba import njit
+except ImportError:
+    njit = None
 
 # -------------------------
-# App + model config
+# App config
 # -------------------------
-app = Flask(__name__)
-CORS(app)
+# MediaPipe extraction + decoding run here so the event loop is never blocked
+CPU_WORKERS = min(4, os.cpu_count() or 1)
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODELS_DIR = os.path.join(BASE_DIR, "models")
-os.makedirs(MODELS_DIR, exist_ok=True)
+async def run_in_cpu_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, fn, *args)
+
+async def get_json(request: Request) -> dict:
+    """Parsed JSON object body, or {} when missing/invalid."""
+    try:
+        body = await request.json()
+    except Exception:
+        return {}
+    return body if isinstance(body, dict) else {}
 
-MODEL_PATH = os.path.join(MODELS_DIR, "converted_model_fixed.h5")
-LABELS_PATH = os.path.join(MODELS_DIR, "labels.json")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 WORDLIST_PATH = os.path.join(MODELS_DIR, "wordlist.txt")
 COLLECT_LANDMARK_DIR = os.path.join(BASE_DIR, "collected_landmarks")
 os.makedirs(COLLECT_LANDMARK_DIR, exist_ok=True)
 
-# Mediapipe hands (used for both realtime extraction and server-side image processing)
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-# We use static_image_mode=True when processing single images via the API
-hands = mp_hands.Hands(static_image_mode=True, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-
-# Globals
-model = None
-labels: List[str] = []
-model_input_dim = None  # 63 or 126 for landmark models
-
 # -------------------------
-# Load model / labels
+# Dynamic batching (single inference thread)
 # -------------------------
-def load_labels(path: str) -> List[str]:
-    with open(path, "r", encoding="utf-8") as f:
-        obj = json.load(f)
-    if isinstance(obj, dict) and "classes" in obj:
-        return obj["classes"]
-    if isinstance(obj, dict):
-        items = sorted(obj.items(), key=lambda kv: int(kv[0]))
-        return [v for _, v in items]
-    if isinstance(obj, list):
-        return obj
-    raise ValueError("Unsupported labels.json format")
-
-def model_input_info(m: tf.keras.Model) -> Tuple[bool, Tuple]:
-    ishape = m.input_shape
-    if isinstance(ishape, list):
-        ishape = ishape[0]
-    dims = [d for d in ishape if d is not None]
-    if len(dims) == 1:
-        return True, (dims[0],)
-    elif len(dims) == 3:
-        return False, (dims[0], dims[1], dims[2])
+MAX_BATCH_WAIT_SECONDS = 0.008
+PREDICT_TIMEOUT_SECONDS = 2.0
+MAX_QUEUED_PREDICTIONS = 8 * MAX_BATCH_SIZE  # beyond this predict requests get 503
+
+class InferenceBusy(Exception):
+    """Inference queue full or result not ready within PREDICT_TIMEOUT_SECONDS (served as 503)."""
+
+# (features (D,), event loop, asyncio.Future) triples waiting for the inference thread
+infer_q: "queue.Queue" = queue.Queue(maxsize=MAX_QUEUED_PREDICTIONS)
+
+def resolve_future(fut: asyncio.Future, result):
+    """Runs on the event loop (via call_soon_threadsafe); result is (idx, conf) or an exception."""
+    if fut.done():  # caller timed out
+        return
+    if isinstance(result, Exception):
+        fut.set_exception(result)
     else:
-        raise ValueError(f"Unsupported input shape: {ishape}")
-
-def load_model_and_labels():
-    global model, labels, model_input_dim
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
-    print("Loading model:", MODEL_PATH)
-    model = keras.models.load_model(MODEL_PATH, compile=False)
-    print("Loaded model.")
-    # input info
-    is_landmark, in_shape = model_input_info(model)
-    if is_landmark:
-        model_input_dim = in_shape[0]
-        print(f"Model expects landmark vector dim: {model_input_dim}")
-    else:
-        model_input_dim = None
-        print(f"Model expects image input shape: {in_shape}")
-    # labels
-    if not os.path.exists(LABELS_PATH):
-        raise FileNotFoundError(f"labels.json not found at {LABELS_PATH}")
-    labels_list = load_labels(LABELS_PATH)
-    print(f"Loaded {len(labels_list)} labels.")
-    return model, labels_list
-
-# load at startup
-try:
-    model, labels = load_model_and_labels()
-except Exception as e:
-    print("Error loading model or labels:", e)
-    model = None
-    labels = []
+        fut.set_result(result)
 
-# -------------------------
-# Landmark extraction / normalization
-# -------------------------
-def normalize_landmarks(lm_list: List[float]) -> List[float]:
+def deliver(loop: asyncio.AbstractEventLoop, fut: asyncio.Future, result):
+    """Hand result to the caller's loop; a loop that has shut down must not kill the inference thread."""
+    try:
+        loop.call_soon_threadsafe(resolve_future, fut, result)
+    except RuntimeError:  # loop closed
+        pass
+
+def inference_loop():
     """
-    lm_list: flat [x,y,z,...] for 21 landmarks (63 floats)
-    translate so wrist (index 0) at origin, scale by max L2 distance
-    returns flattened list (63 floats)
+    Pull queued feature rows, group up to MAX_BATCH_SIZE of them within a
+    MAX_BATCH_WAIT_SECONDS window, run one model call and hand each caller its result.
     """
-    arr = np.array(lm_list, dtype=np.float32).reshape(-1, 3)
-    wrist = arr[0].copy()
-    arr -= wrist
-    max_dist = np.max(np.linalg.norm(arr, axis=1))
-    if max_dist > 0:
-        arr /= max_dist
-    return arr.flatten().tolist()
-
-def extract_hand_landmarks_from_image_bgr(image_bgr: np.ndarray):
+    while True:
+        items = [infer_q.get()]
+        deadline = time.monotonic() + MAX_BATCH_WAIT_SECONDS
+        while len(items) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(infer_q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # callers that already timed out cancelled their future; don't spend model time on them
+        items = [it for it in items if not it[2].done()]
+        if not items:
+            continue
+        try:
+            idxs, confs = classify([feats for feats, _, _ in items])
+            for (_, loop, fut), idx, conf in zip(items, idxs, confs):
+                deliver(loop, fut, (int(idx), float(conf)))
+        except Exception as e:
+            for _, loop, fut in items:
+                deliver(loop, fut, e)
+
+async def predict_batched(feats: np.ndarray) -> Tuple[int, float]:
     """
-    Process a BGR image (OpenCV) with MediaPipe (static_image mode).
-    Returns features list (63 or 126 floats) or None if no hands detected.
+    Queue one float32 feature row for the inference thread and await (class index, confidence)
+    on the event loop, so no worker thread is held while the batch fills.
+    The row is only read (copied into core.INPUT_BUF), so views into the caller's buffers are fine.
+    Raises InferenceBusy when the queue is full or the result takes over PREDICT_TIMEOUT_SECONDS.
     """
-    image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-    results = hands.process(image_rgb)
-    if not results.multi_hand_landmarks:
-        return None, False  # no hands detected
-
-    left_hand = None
-    right_hand = None
-    for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
-        lm_flat = []
-        for lm in hand_landmarks.landmark:
-            lm_flat.extend([lm.x, lm.y, lm.z])
-        lm_norm = normalize_landmarks(lm_flat)
-        label = handedness.classification[0].label  # "Left" or "Right"
-        if label == "Left":
-            left_hand = lm_norm
-        else:
-            right_hand = lm_norm
-
-    if left_hand is None:
-        left_hand = [0.0] * 63
-    if right_hand is None:
-        right_hand = [0.0] * 63
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    try:
+        infer_q.put_nowait((feats, loop, fut))
+    except queue.Full:
+        raise InferenceBusy("Inference queue full, retry later")
+    try:
+        return await asyncio.wait_for(fut, PREDICT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise InferenceBusy("Inference timed out, retry later")
 
-    feats = left_hand + right_hand  # always produce 126 features by default
-    # If model expects 63, we will pick the "bigger" hand downstream
-    return feats, True
+inference_thread = threading.Thread(target=inference_loop, name="inference", daemon=True)
+inference_thread.start()
 
 # -------------------------
 # Collection endpoint (landmarks)
 # -------------------------
-@app.route('/api/collect-landmark', methods=['POST'])
-def collect_landmark():
+# disk writes happen off the request path on a small pool; the executor's own queue is
+# unbounded, so pending writes are capped with a semaphore (503 when full)
+MAX_PENDING_WRITES = 256
+io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="io")
+pending_writes = threading.BoundedSemaphore(MAX_PENDING_WRITES)
+
+def persist_landmark(npy_path: str, x: np.ndarray):
+    """Write x to npy_path atomically (temp file + rename) so readers never see partial files."""
+    os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+    tmp_path = npy_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, x)
+    os.replace(tmp_path, npy_path)
+
+class LabelCounter:
+    """Next sample index for a label directory, starting after the highest existing NNNNNN.npy."""
+
+    def __init__(self, class_dir: str):
+        self.lock = threading.Lock()
+        names = os.listdir(class_dir) if os.path.isdir(class_dir) else []
+        self.n = max((int(n[:-4]) for n in names if n.endswith('.npy') and n[:-4].isdigit()), default=-1) + 1
+
+    def next(self) -> int:
+        with self.lock:
+            v = self.n
+            self.n += 1
+            return v
+
+counters = {}  # label -> LabelCounter
+counters_lock = threading.Lock()
+
+def next_landmark_path(label: str) -> str:
+    """collected_landmarks/<label>/NNNNNN.npy (sortable); uuid name if the directory can't be scanned.
+
+    The first call for a label lists its directory, so call it through an executor, not on the event loop.
+    """
+    class_dir = os.path.join(COLLECT_LANDMARK_DIR, label)
+    try:
+        with counters_lock:
+            counter = counters.get(label)
+        if counter is None:
+            # scan outside counters_lock so other labels aren't held up; first one in wins
+            fresh = LabelCounter(class_dir)
+            with counters_lock:
+                counter = counters.setdefault(label, fresh)
+        name = f"{counter.next():06d}"
+    except (OSError, ValueError):
+        name = uuid.uuid4().hex
+    return os.path.join(class_dir, f"{name}.npy")
+
+def persist_done(fut):
+    pending_writes.release()
+    if fut.exception() is not None:
+        print("[ERROR] Failed to save landmark:", fut.exception())
+
+async def collect_landmark(request: Request):
     """
     Accepts JSON:
       { "label": "A", "landmarks": [x..] }
     or legacy { "label":"A", "x": [...] }
-    Saves numpy + json files under collected_landmarks/<label>/
+    Saves a float32 (126,) .npy file under collected_landmarks/<label>/ (label is the directory name).
+    The write is queued on io_pool; the response returns before it hits disk
+    (503 when MAX_PENDING_WRITES writes are already queued).
     """
     try:
-        data = request.get_json(force=True)
+        data = await get_json(request)
         if not data:
-            return jsonify({'success': False, 'error': 'No JSON body'}), 400
+            return JSONResponse({'success': False, 'error': 'No JSON body'}, status_code=400)
         label = data.get('label')
         if not label:
-            return jsonify({'success': False, 'error': 'No label provided'}), 400
+            return JSONResponse({'success': False, 'error': 'No label provided'}, status_code=400)
+        # label becomes a directory name under collected_landmarks; keep it from escaping
+        label = str(label)
+        if label == '.' or '..' in label or any(c in label for c in ('/', '\\', '\0')):
+            return JSONResponse({'success': False, 'error': 'Invalid label'}, status_code=400)
         landmarks = data.get('landmarks') or data.get('x')
         if landmarks is None:
-            return jsonify({'success': False, 'error': 'No landmarks provided'}), 400
+            return JSONResponse({'success': False, 'error': 'No landmarks provided'}, status_code=400)
         landmarks = list(map(float, landmarks))
         if len(landmarks) == 63:
             landmarks = landmarks + [0.0]*63
         if len(landmarks) != 126:
-            return jsonify({'success': False, 'error': 'landmarks must be length 63 or 126'}), 400
-        class_dir = os.path.join(COLLECT_LANDMARK_DIR, label)
-        os.makedirs(class_dir, exist_ok=True)
-        uid = uuid.uuid4().hex
-        npy_path = os.path.join(class_dir, f"{uid}.npy")
-        json_path = os.path.join(class_dir, f"{uid}.json")
-        np.save(npy_path, np.asarray(landmarks, dtype=np.float32))
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump({'x': landmarks, 'label': label}, f)
-        return jsonify({'success': True, 'npy': npy_path, 'json': json_path}), 200
+            return JSONResponse({'success': False, 'error': 'landmarks must be length 63 or 126'}, status_code=400)
+        if not pending_writes.acquire(blocking=False):
+            return JSONResponse({'success': False, 'error': 'Too many pending writes, retry later'}, status_code=503)
+        try:
+            npy_path = await asyncio.get_running_loop().run_in_executor(None, next_landmark_path, label)
+            fut = io_pool.submit(persist_landmark, npy_path, np.asarray(landmarks, dtype=np.float32))
+        except Exception:
+            pending_writes.release()
+            raise
+        fut.add_done_callback(persist_done)
+        return JSONResponse({'success': True, 'npy': npy_path})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
 
 # -------------------------
 # Session & sentence builder
@@ -208,15 +256,57 @@ HOLD_FRAMES = 6
 WORD_PAUSE_SECONDS = 1.2
 MIN_CONFIDENCE_TO_ACCEPT = 0.5  # tune as needed
 
+MAX_SESSIONS = 1000  # least recently used sessions are evicted beyond this
+
+@dataclass(slots=True)
+class Session:
+    # sliding window of recent predictions as ring buffers (label -1 = no hand)
+    labels_buf: np.ndarray = field(default_factory=lambda: np.full(SMOOTH_WINDOW, -1, dtype=np.int32))
+    confs_buf: np.ndarray = field(default_factory=lambda: np.zeros(SMOOTH_WINDOW, dtype=np.float32))
+    hist_head: int = 0
+    hist_len: int = 0
+    stable_label: Optional[int] = None
+    stable_count: int = 0
+    last_hand_ts: float = field(default_factory=time.time)
+    committed_letters: List[str] = field(default_factory=list)  # list of chars
+    sentence: str = ""  # built sentence string
+
+    def push_prediction(self, label_idx: int, confidence: float):
+        self.labels_buf[self.hist_head] = label_idx
+        self.confs_buf[self.hist_head] = confidence
+        self.hist_head = (self.hist_head + 1) % SMOOTH_WINDOW
+        if self.hist_len < SMOOTH_WINDOW:
+            self.hist_len += 1
+
+    def clear_predictions(self):
+        self.hist_head = 0
+        self.hist_len = 0
+
+class SessionStore:
+    """In-memory client_id -> Session map with LRU eviction beyond max_sessions."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, client_id: str) -> Session:
+        with self._lock:
+            s = self._sessions.get(client_id)
+            if s is None:
+                s = self._sessions[client_id] = Session()
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(client_id)
+            return s
+
+    def pop(self, client_id: str, default=None):
+        with self._lock:
+            return self._sessions.pop(client_id, default)
+
 # in-memory sessions (client_id -> state)
-sessions = defaultdict(lambda: {
-    "pred_hist": deque(maxlen=SMOOTH_WINDOW),  # (label_idx, conf, ts)
-    "stable_label": None,
-    "stable_count": 0,
-    "last_hand_ts": time.time(),
-    "committed_letters": [],  # list of chars
-    "sentence": ""            # built sentence string
-})
+sessions = SessionStore(MAX_SESSIONS)
 
 # optional wordlist for correction
 wordlist = []
@@ -230,213 +320,361 @@ else:
 
 import difflib
 
-def majority_vote_label(pred_hist):
-    if not pred_hist:
-        return None, 0.0
+# SymSpell index for word correction (falls back to difflib when disabled or not installed)
+USE_SYMSPELL = os.environ.get("USE_SYMSPELL", "1") != "0"
+SYMSPELL_MAX_EDIT_DISTANCE = 2
+WORD_MATCH_CUTOFF = 0.7  # difflib similarity ratio a correction must reach (both paths)
+sym_spell = None
+if USE_SYMSPELL and wordlist:
+    try:
+        from symspellpy import SymSpell, Verbosity
+        sym_spell = SymSpell(max_dictionary_edit_distance=SYMSPELL_MAX_EDIT_DISTANCE, prefix_length=7)
+        for w in wordlist:
+            sym_spell.create_dictionary_entry(w, 1)
+    except ImportError:
+        print("[INFO] symspellpy not installed - using difflib for word correction")
+        sym_spell = None
+
+def majority_vote_dict(labels_buf, confs_buf, head, n_valid, min_conf):
+    """
+    Majority label over the last n_valid window entries (ring buffers ending at head)
+    with confidence >= min_conf. Ties are broken by summed confidence, then by the
+    label that entered the window first. Returns (label, avg_conf) or (-1, 0.0).
+    """
+    window = len(labels_buf)
+    lbls = labels_buf.tolist()
+    cs = confs_buf.tolist()
     counts = {}
     confs = {}
-    for lbl, conf, ts in pred_hist:
-        if lbl is None:
-            continue
-        if conf < MIN_CONFIDENCE_TO_ACCEPT:
+    for k in range(n_valid):
+        i = (head - n_valid + k) % window  # oldest -> newest
+        lbl, conf = lbls[i], cs[i]
+        if lbl < 0 or conf < min_conf:
             continue
         counts[lbl] = counts.get(lbl, 0) + 1
         confs.setdefault(lbl, []).append(conf)
     if not counts:
-        return None, 0.0
-    best = max(counts.items(), key=lambda kv: (kv[1], sum(confs.get(kv[0], []))))
+        return -1, 0.0
+    best = max(counts.items(), key=lambda kv: (kv[1], sum(confs[kv[0]])))
     lbl = best[0]
-    avg_conf = float(sum(confs[lbl]) / len(confs[lbl]))
-    return lbl, avg_conf
+    return lbl, float(sum(confs[lbl]) / len(confs[lbl]))
+
+def majority_vote_arrays(labels_buf, confs_buf, head, n_valid, min_conf):
+    """Same result as majority_vote_dict using flat per-class arrays (numba-compiled)."""
+    window = len(labels_buf)
+    n_classes = 0
+    for i in range(window):
+        if labels_buf[i] + 1 > n_classes:
+            n_classes = labels_buf[i] + 1
+    counts = np.zeros(n_classes, np.int32)
+    sums = np.zeros(n_classes, np.float64)
+    first_seen = np.full(n_classes, window, np.int32)
+    for k in range(n_valid):
+        i = (head - n_valid + k) % window  # oldest -> newest
+        lbl = labels_buf[i]
+        if lbl < 0 or confs_buf[i] < min_conf:
+            continue
+        if counts[lbl] == 0:
+            first_seen[lbl] = k
+        counts[lbl] += 1
+        sums[lbl] += confs_buf[i]
+    best = -1
+    for k in range(n_classes):
+        if counts[k] == 0:
+            continue
+        if best < 0 or counts[k] > counts[best] or (counts[k] == counts[best] and (
+                sums[k] > sums[best] or (sums[k] == sums[best] and first_seen[k] < first_seen[best]))):
+            best = k
+    if best < 0:
+        return -1, 0.0
+    return best, sums[best] / counts[best]
+
+if njit is not None:
+    majority_vote = njit(cache=True)(majority_vote_arrays)
+    # compile before the first request
+    majority_vote(np.zeros(SMOOTH_WINDOW, dtype=np.int32), np.zeros(SMOOTH_WINDOW, dtype=np.float32), 0, 1, MIN_CONFIDENCE_TO_ACCEPT)
+else:
+    majority_vote = majority_vote_dict
 
-def correct_last_word(client_id, max_suggestions=3):
-    s = sessions[client_id]
-    sent = s["sentence"].rstrip()
+def correct_last_word(s: Session, max_suggestions=3):
+    sent = s.sentence.rstrip()
     if not sent or not wordlist:
         return None
     parts = sent.split(" ")
     last = parts[-1].lower()
     if not last:
         return None
-    candidates = difflib.get_close_matches(last, wordlist, n=max_suggestions, cutoff=0.7)
-    if candidates:
-        best = candidates[0]
+    if sym_spell is not None:
+        # SymSpell only narrows the candidates; difflib's ratio cutoff still decides, so short
+        # out-of-list words ("hi", "ok") are left alone like on the difflib path
+        suggestions = sym_spell.lookup(last, Verbosity.ALL, max_edit_distance=SYMSPELL_MAX_EDIT_DISTANCE)
+        scored = [(difflib.SequenceMatcher(None, sg.term, last).ratio(), sg.term) for sg in suggestions]
+        scored = [x for x in scored if x[0] >= WORD_MATCH_CUTOFF]
+        best = max(scored)[1] if scored else None  # same (ratio, word) order as get_close_matches
+    else:
+        candidates = difflib.get_close_matches(last, wordlist, n=max_suggestions, cutoff=WORD_MATCH_CUTOFF)
+        best = candidates[0] if candidates else None
+    if best:
         parts[-1] = best
-        new_sent = " ".join(parts) + (" " if s["sentence"].endswith(" ") else "")
-        s["sentence"] = new_sent
+        new_sent = " ".join(parts) + (" " if s.sentence.endswith(" ") else "")
+        s.sentence = new_sent
         return best
     return None
 
 def session_add_frame(client_id, label_idx, confidence, hand_present):
-    s = sessions[client_id]
+    s = sessions.get(client_id)
     ts = time.time()
     if hand_present:
-        s["last_hand_ts"] = ts
-    s["pred_hist"].append((label_idx, float(confidence) if confidence is not None else 0.0, ts))
-    stable_lbl, avg_conf = majority_vote_label(s["pred_hist"])
-    if stable_lbl is None:
-        s["stable_label"] = None
-        s["stable_count"] = 0
+        s.last_hand_ts = ts
+    s.push_prediction(-1 if label_idx is None else label_idx, float(confidence) if confidence is not None else 0.0)
+    stable_lbl, avg_conf = majority_vote(s.labels_buf, s.confs_buf, s.hist_head, s.hist_len, MIN_CONFIDENCE_TO_ACCEPT)
+    if stable_lbl < 0:
+        s.stable_label = None
+        s.stable_count = 0
     else:
-        if s["stable_label"] == stable_lbl:
-            s["stable_count"] += 1
+        if s.stable_label == stable_lbl:
+            s.stable_count += 1
         else:
-            s["stable_label"] = stable_lbl
-            s["stable_count"] = 1
+            s.stable_label = int(stable_lbl)
+            s.stable_count = 1
     committed = None
-    if s["stable_label"] is not None and s["stable_count"] >= HOLD_FRAMES:
-        committed = s["stable_label"]
-        s["stable_label"] = None
-        s["stable_count"] = 0
-        s["pred_hist"].clear()
-        if labels and committed < len(labels):
-            ch = labels[committed]
+    if s.stable_label is not None and s.stable_count >= HOLD_FRAMES:
+        committed = s.stable_label
+        s.stable_label = None
+        s.stable_count = 0
+        s.clear_predictions()
+        if core.labels and committed < len(core.labels):
+            ch = core.labels[committed]
         else:
             ch = str(committed)
         # collapse repeats
-        if not s["committed_letters"] or s["committed_letters"][-1] != ch:
-            s["committed_letters"].append(ch)
-            s["sentence"] += ch
+        if not s.committed_letters or s.committed_letters[-1] != ch:
+            s.committed_letters.append(ch)
+            s.sentence += ch
     # word boundary
-    time_since_hand = ts - s["last_hand_ts"]
-    if time_since_hand >= WORD_PAUSE_SECONDS and s["committed_letters"]:
-        if not s["sentence"].endswith(" "):
-            s["sentence"] += " "
-        correct_last_word(client_id)
+    time_since_hand = ts - s.last_hand_ts
+    if time_since_hand >= WORD_PAUSE_SECONDS and s.committed_letters:
+        if not s.sentence.endswith(" "):
+            s.sentence += " "
+        correct_last_word(s)
     return committed
 
 def get_session_sentence(client_id):
-    return sessions[client_id]["sentence"]
+    return sessions.get(client_id).sentence
 
 # -------------------------
 # Health endpoint
 # -------------------------
-@app.route('/api/health', methods=['GET'])
-def health():
-    return jsonify({
+async def health(request: Request):
+    return JSONResponse({
         'status': 'ok',
-        'model_loaded': model is not None,
-        'labels_loaded': bool(labels),
-        'labels_count': len(labels),
+        'model_loaded': core.model is not None,
+        'labels_loaded': bool(core.labels),
+        'labels_count': len(core.labels),
         'wordlist_loaded': bool(wordlist)
     })
 
 # -------------------------
 # Prediction endpoint
 # -------------------------
-@app.route('/api/predict-sign', methods=['POST'])
-def predict_sign_endpoint():
+MAX_IMAGE_DIM = 1280  # keep reasonable size for MediaPipe
+
+def probe_image_size(raw: bytes):
+    """Read (height, width) from the PNG IHDR or JPEG SOF header without decoding; None if unknown."""
+    if raw[:8] == b'\x89PNG\r\n\x1a\n' and len(raw) >= 24:
+        w, h = struct.unpack('>II', raw[16:24])
+        return h, w
+    if raw[:2] != b'\xff\xd8':
+        return None
+    i, n = 2, len(raw)
+    while i + 9 <= n:
+        if raw[i] != 0xFF:
+            return None
+        marker = raw[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # standalone markers
+            i += 2
+            continue
+        # SOF0..SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack('>HH', raw[i + 5:i + 9])
+            return h, w
+        seg_len = struct.unpack('>H', raw[i + 2:i + 4])[0]
+        i += 2 + seg_len
+    return None
+
+def decode_image(raw: bytes):
+    """
+    Decode encoded image bytes (JPEG/PNG) to a BGR array; None if undecodable.
+    Large images are downscaled by libjpeg during decoding (IMREAD_REDUCED_COLOR_2/4)
+    instead of a full decode followed by cv2.resize.
+    """
+    flag = cv2.IMREAD_COLOR
+    size = probe_image_size(raw)
+    if size is not None:
+        max_side = max(size)
+        if max_side > 2 * MAX_IMAGE_DIM:
+            flag = cv2.IMREAD_REDUCED_COLOR_4
+        elif max_side > MAX_IMAGE_DIM:
+            flag = cv2.IMREAD_REDUCED_COLOR_2
+    return cv2.imdecode(np.frombuffer(raw, np.uint8), flag)
+
+def features_from_image(image: np.ndarray, client_id: Optional[str]) -> Optional[np.ndarray]:
+    """
+    Resize if needed and extract the (126,) landmark features; None if no hands.
+    Without a client_id the frame goes through the static MediaPipe instance.
+    Blocking; call through run_in_cpu_pool.
+    """
+    # fine resizing for what the reduced decode did not already bring under MAX_IMAGE_DIM
+    h, w = image.shape[:2]
+    if max(h, w) > MAX_IMAGE_DIM:
+        scale = MAX_IMAGE_DIM / max(h, w)
+        image = cv2.resize(image, (int(w*scale), int(h*scale)), interpolation=cv2.INTER_AREA)
+
+    feats, hand_present = extract_hand_landmarks_from_image_bgr(image, client_id)
+    return feats
+
+def features_from_encoded(raw: Optional[bytes], client_id: Optional[str]) -> Tuple[bool, Optional[np.ndarray]]:
+    """Decode encoded image bytes and extract features; returns (image decoded, features)."""
+    image = decode_image(raw) if raw else None
+    if image is None:
+        return False, None
+    return True, features_from_image(image, client_id)
+
+def features_from_base64(imdata: Optional[str], client_id: Optional[str]) -> Tuple[bool, Optional[np.ndarray]]:
+    """Same as features_from_encoded for a base64 string / data URL."""
+    if not imdata:
+        return False, None
+    # strip data URL header ("data:image/jpeg;base64,")
+    if imdata[:11] == 'data:image/':
+        imdata = imdata.partition(',')[2]
+    return features_from_encoded(base64.b64decode(imdata, validate=False), client_id)
+
+async def predict_from_features(feats: Optional[np.ndarray], client_id: Optional[str]) -> dict:
+    """Run (batched) inference on the features and update the client's session ('default' without id)."""
+    client_id = client_id or 'default'  # session key
+    if feats is None:
+        # no hands detected: update session so that word-boundary detection can occur
+        session_add_frame(client_id, None, 0.0, False)
+        return {'success': True, 'prediction': None, 'confidence': 0.0, 'committed_letter_idx': None, 'sentence': get_session_sentence(client_id)}
+
+    # If model expects 63, pick biggest hand
+    use = select_model_features(feats)
+
+    # predict
+    idx, confidence = await predict_batched(use)
+
+    predicted_label = core.labels[idx] if core.labels and idx < len(core.labels) else str(idx)
+
+    # session update
+    committed = session_add_frame(client_id, idx, confidence, True)
+    sentence = get_session_sentence(client_id)
+
+    return {
+        'success': True,
+        'prediction': str(predicted_label),
+        'confidence': float(confidence),
+        'committed_letter_idx': int(committed) if committed is not None else None,
+        'sentence': sentence
+    }
+
+async def predict_sign_endpoint(request: Request):
     """
     POST: file upload under 'image' or JSON body with 'image' base64 string.
     Optional: provide client id in header 'X-Client-Id' or JSON 'client_id'.
     Returns: prediction (label), confidence, committed_letter_idx (if any), and full sentence.
     """
     try:
-        # load image
-        image = None
-        if 'image' in request.files:
-            f = request.files['image']
-            arr = np.frombuffer(f.read(), np.uint8)
-            image = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        else:
-            body = request.get_json(silent=True) or {}
-            if 'image' in body:
-                imdata = body['image']
-                if imdata.startswith('data:image'):
-                    imdata = imdata.split(',')[1]
-                b = base64.b64decode(imdata)
-                arr = np.frombuffer(b, np.uint8)
-                image = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        if image is None:
-            return jsonify({'success': False, 'error': 'No image provided'}), 400
-
-        # optional resizing (keep reasonable size for MediaPipe)
-        h, w = image.shape[:2]
-        max_dim = 1280
-        if max(h, w) > max_dim:
-            scale = max_dim / max(h, w)
-            image = cv2.resize(image, (int(w*scale), int(h*scale)), interpolation=cv2.INTER_AREA)
-
-        feats, hand_present = extract_hand_landmarks_from_image_bgr(image)
-        if feats is None:
-            # no hands detected: update session so that word-boundary detection can occur
-            client_id = request.headers.get('X-Client-Id') or (request.json or {}).get('client_id') or 'default'
-            session_add_frame(client_id, None, 0.0, False)
-            return jsonify({'success': True, 'prediction': None, 'confidence': 0.0, 'committed_letter_idx': None, 'sentence': get_session_sentence(client_id)}), 200
-
-        # If model expects 63, pick biggest hand
-        feats_arr = np.array(feats, dtype=np.float32)
-        if model_input_dim == 63:
-            left = feats_arr[:63]
-            right = feats_arr[63:]
-            if np.count_nonzero(left) >= np.count_nonzero(right):
-                use = left
-            else:
-                use = right
-            X = use.reshape(1, -1)
+        body = {}
+        if request.headers.get('content-type', '').startswith('multipart/form-data'):
+            form = await request.form()
+            upload = form.get('image')
+            raw = await upload.read() if isinstance(upload, UploadFile) else None
+            job, arg = features_from_encoded, raw
         else:
-            X = feats_arr.reshape(1, -1)
-            # if model_input_dim is set but different, pad/truncate
-            if model_input_dim is not None and X.shape[1] != model_input_dim:
-                if X.shape[1] < model_input_dim:
-                    pad = np.zeros((1, model_input_dim - X.shape[1]), dtype=np.float32)
-                    X = np.concatenate([X, pad], axis=1)
-                elif X.shape[1] > model_input_dim:
-                    X = X[:, :model_input_dim]
-
-        # ensure float32
-        X = X.astype(np.float32)
-
-        # predict
-        preds = model.predict(X, verbose=0)
-        idx = int(np.argmax(preds[0]))
-        confidence = float(preds[0][idx])
-
-        predicted_label = labels[idx] if labels and idx < len(labels) else str(idx)
-
-        # session update
-        client_id = request.headers.get('X-Client-Id') or (request.json or {}).get('client_id') or 'default'
-        committed = session_add_frame(client_id, idx, confidence, True)
-        sentence = get_session_sentence(client_id)
-
-        return jsonify({
-            'success': True,
-            'prediction': str(predicted_label),
-            'confidence': float(confidence),
-            'committed_letter_idx': int(committed) if committed is not None else None,
-            'sentence': sentence
-        }), 200
+            body = await get_json(request)
+            job, arg = features_from_base64, body.get('image')
+
+        # no id -> static MediaPipe instance (no cross-stream tracking), 'default' session
+        client_id = request.headers.get('X-Client-Id') or body.get('client_id') or None
+        decoded, feats = await run_in_cpu_pool(job, arg, client_id)
+        if not decoded:
+            return JSONResponse({'success': False, 'error': 'No image provided'}, status_code=400)
+        return JSONResponse(await predict_from_features(feats, client_id))
+
+    except InferenceBusy as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=503)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
 
+async def predict_sign_raw_endpoint(request: Request):
+    """
+    POST: raw encoded image bytes (Content-Type: application/octet-stream or image/jpeg),
+    skipping base64 encoding entirely.
+    Optional: client id in header 'X-Client-Id' or query param 'client_id'.
+    Returns: same payload as /api/predict-sign.
+    """
+    try:
+        raw = await request.body()
+        client_id = request.headers.get('X-Client-Id') or request.query_params.get('client_id') or None
+        decoded, feats = await run_in_cpu_pool(features_from_encoded, raw, client_id)
+        if not decoded:
+            return JSONResponse({'success': False, 'error': 'No image provided'}, status_code=400)
+        return JSONResponse(await predict_from_features(feats, client_id))
+
+    except InferenceBusy as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=503)
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
 
 # -------------------------
 # Sentence endpoints
 # -------------------------
-@app.route('/api/sentence', methods=['GET'])
-def get_sentence_endpoint():
-    client_id = request.headers.get('X-Client-Id') or request.args.get('client_id') or 'default'
-    return jsonify({'sentence': get_session_sentence(client_id)}), 200
-
-@app.route('/api/sentence/reset', methods=['POST'])
-def reset_sentence_endpoint():
-    client_id = request.headers.get('X-Client-Id') or (request.json or {}).get('client_id') or 'default'
-    sessions.pop(client_id, None)
-    return jsonify({'ok': True}), 200
+async def get_sentence_endpoint(request: Request):
+    client_id = request.headers.get('X-Client-Id') or request.query_params.get('client_id') or 'default'
+    return JSONResponse({'sentence': get_session_sentence(client_id)})
 
+async def reset_sentence_endpoint(request: Request):
+    body = await get_json(request)
+    client_id = request.headers.get('X-Client-Id') or body.get('client_id') or 'default'
+    sessions.pop(client_id, None)
+    return JSONResponse({'ok': True})
 
+# -------------------------
+# App
+# -------------------------
+routes = [
+    Route('/api/collect-landmark', collect_landmark, methods=['POST']),
+    Route('/api/health', health, methods=['GET']),
+    Route('/api/predict-sign', predict_sign_endpoint, methods=['POST']),
+    Route('/api/predict-sign/raw', predict_sign_raw_endpoint, methods=['POST']),
+    Route('/api/sentence', get_sentence_endpoint, methods=['GET']),
+    Route('/api/sentence/reset', reset_sentence_endpoint, methods=['POST']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+)
 
 # -------------------------
 # Run
 # -------------------------
 if __name__ == '__main__':
-    if model is None or not labels:
+    if core.model is None or not core.labels:
         try:
-            model, labels = load_model_and_labels()
+            core.model, core.labels = core.load_model_and_labels()
+            core.warmup()
         except Exception as e:
             print("Failed to load model/labels on startup:", e)
             sys.exit(1)
+    import uvicorn
     print("Starting Sign Language Recognition Service on http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # loopback only: server.js proxies to localhost:5000 and /api/collect-landmark writes to disk
+    uvicorn.run(app, host='127.0.0.1', port=5000, workers=1, http='h11')
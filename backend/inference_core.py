@@ -0,0 +1,360 @@
+"""
+Shared inference core for the sign language services (app.py, sign_language_service.py)
+- MediaPipe Hands instances (static one-shot + per-client video mode)
+- Keras model -> TFLite float16 runtime (XLA-compiled Keras fallback)
+- Landmark extraction / normalization
+
+Importing this module loads the model and MediaPipe graphs once per process.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+import cv2
+import tensorflow as tf
+from tensorflow import keras
+
+# Try import mediapipe
+try:
+    import mediapipe as mp
+except Exception as e:
+    print("ERROR: mediapipe is not installed. Run: pip install mediapipe opencv-python")
+    raise
+
+# -------------------------
+# Model config
+# -------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+os.makedirs(MODELS_DIR, exist_ok=True)
+
+MODEL_PATH = os.path.join(MODELS_DIR, "converted_model_fixed.h5")
+LABELS_PATH = os.path.join(MODELS_DIR, "labels.json")
+
+# Mediapipe hands (used for both realtime extraction and server-side image processing)
+mp_hands = mp.solutions.hands
+mp_drawing = mp.solutions.drawing_utils
+# One-shot requests (no client id) use a static_image_mode=True instance
+hands = mp_hands.Hands(static_image_mode=True, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+hands_lock = threading.Lock()  # Hands.process is not thread-safe
+
+# Per-client video-mode instances: palm detection only reruns when tracking is lost
+HANDS_IDLE_SECONDS = 60.0
+HANDS_SWEEP_INTERVAL_SECONDS = 30.0
+MAX_TRACKED_CLIENTS = 64  # least recently used trackers are closed beyond this
+# client_id -> {"hands": Hands, "lock": Lock, "last_used": monotonic ts}, in LRU order
+hands_per_client: "OrderedDict[str, dict]" = OrderedDict()
+hands_per_client_lock = threading.Lock()
+
+WARMUP_FRAME = np.zeros((256, 256, 3), dtype=np.uint8)  # black frame for warmup()
+
+def new_client_hands_entry() -> dict:
+    h = mp_hands.Hands(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    return {"hands": h, "lock": threading.Lock(), "last_used": 0.0, "closed": False}
+
+def close_hands_entry(entry: dict):
+    # a worker may still hold this entry; it sees "closed" under the lock and re-fetches
+    with entry["lock"]:
+        entry["closed"] = True
+        entry["hands"].close()
+
+def get_client_hands(client_id: str) -> dict:
+    """
+    The client's tracker entry, created on first use (LRU-capped at MAX_TRACKED_CLIENTS).
+    Graph construction happens outside hands_per_client_lock so other clients' lookups
+    don't wait on it. The entry may be closed by eviction before the caller locks it;
+    check entry["closed"] under entry["lock"].
+    """
+    with hands_per_client_lock:
+        entry = hands_per_client.get(client_id)
+        if entry is not None:
+            hands_per_client.move_to_end(client_id)
+            entry["last_used"] = time.monotonic()
+            return entry
+    fresh = new_client_hands_entry()
+    evicted = None
+    with hands_per_client_lock:
+        entry = hands_per_client.setdefault(client_id, fresh)
+        if entry is fresh:
+            if len(hands_per_client) > MAX_TRACKED_CLIENTS:
+                _, evicted = hands_per_client.popitem(last=False)
+        else:  # another request for this client got there first
+            hands_per_client.move_to_end(client_id)
+        entry["last_used"] = time.monotonic()
+    if entry is not fresh:
+        close_hands_entry(fresh)
+    if evicted is not None:
+        close_hands_entry(evicted)
+    return entry
+
+def hands_sweeper():
+    """Close video-mode Hands instances of clients idle for HANDS_IDLE_SECONDS."""
+    while True:
+        time.sleep(HANDS_SWEEP_INTERVAL_SECONDS)
+        cutoff = time.monotonic() - HANDS_IDLE_SECONDS
+        with hands_per_client_lock:
+            idle = [cid for cid, e in hands_per_client.items() if e["last_used"] < cutoff]
+            expired = [hands_per_client.pop(cid) for cid in idle]
+        for e in expired:
+            close_hands_entry(e)
+
+threading.Thread(target=hands_sweeper, name="hands-sweeper", daemon=True).start()
+
+# TFLite runtime (FP16 weights, XNNPACK kernels for the dense layers)
+TFLITE_NUM_THREADS = 2
+MAX_BATCH_SIZE = 32  # rows per inference call (see classify)
+
+# Globals
+model = None
+interpreter = None  # tf.lite.Interpreter built from `model`; None -> fall back to Keras
+input_index = None
+output_index = None
+predict_fn = None  # XLA-compiled tf.function over the Keras model (used when TFLite is unavailable)
+inference_lock = threading.Lock()  # guards INPUT_BUF and the interpreter (invoke is not thread-safe)
+labels: List[str] = []
+model_input_dim = None  # 63 or 126 for landmark models
+INPUT_BUF = None  # preallocated float32 (MAX_BATCH_SIZE, input dim) model input, filled in place
+
+# -------------------------
+# Load model / labels
+# -------------------------
+def load_labels(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    if isinstance(obj, dict) and "classes" in obj:
+        return obj["classes"]
+    if isinstance(obj, dict):
+        items = sorted(obj.items(), key=lambda kv: int(kv[0]))
+        return [v for _, v in items]
+    if isinstance(obj, list):
+        return obj
+    raise ValueError("Unsupported labels.json format")
+
+def model_input_info(m: tf.keras.Model) -> Tuple[bool, Tuple]:
+    ishape = m.input_shape
+    if isinstance(ishape, list):
+        ishape = ishape[0]
+    dims = [d for d in ishape if d is not None]
+    if len(dims) == 1:
+        return True, (dims[0],)
+    elif len(dims) == 3:
+        return False, (dims[0], dims[1], dims[2])
+    else:
+        raise ValueError(f"Unsupported input shape: {ishape}")
+
+def build_tflite_interpreter(m: tf.keras.Model) -> tf.lite.Interpreter:
+    """
+    Convert a Keras model to a TFLite FlatBuffer with float16 weights.
+    Float models get the XNNPACK delegate by default; int8 is avoided on purpose
+    (slower than FP kernels on desktop x86).
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(m)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    tflite_model = converter.convert()
+    interp = tf.lite.Interpreter(model_content=tflite_model, num_threads=TFLITE_NUM_THREADS)
+    interp.allocate_tensors()
+    return interp
+
+def xla_batch_buckets() -> List[int]:
+    """Batch sizes the XLA path runs with (powers of two up to MAX_BATCH_SIZE)."""
+    buckets = [1]
+    while buckets[-1] < MAX_BATCH_SIZE:
+        buckets.append(min(buckets[-1] * 2, MAX_BATCH_SIZE))
+    return buckets
+
+def load_model_and_labels():
+    global model, labels, model_input_dim, interpreter, input_index, output_index, predict_fn, INPUT_BUF
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
+    print("Loading model:", MODEL_PATH)
+    model = keras.models.load_model(MODEL_PATH, compile=False)
+    print("Loaded model.")
+    ishape = model.input_shape[0] if isinstance(model.input_shape, list) else model.input_shape
+    predict_fn = tf.function(
+        lambda x: model(x, training=False),
+        jit_compile=True,
+        reduce_retracing=True,
+        input_signature=[tf.TensorSpec(ishape, tf.float32)],
+    )
+    # TFLite FP16 runtime for inference (keeps Keras model as fallback)
+    try:
+        interpreter = build_tflite_interpreter(model)
+        input_index = interpreter.get_input_details()[0]["index"]
+        output_index = interpreter.get_output_details()[0]["index"]
+        print("Converted model to TFLite (float16).")
+    except Exception as e:
+        print("[WARN] TFLite conversion failed, using Keras predict:", e)
+        interpreter = None
+        input_index = None
+        output_index = None
+    # input info
+    is_landmark, in_shape = model_input_info(model)
+    if is_landmark:
+        model_input_dim = in_shape[0]
+        print(f"Model expects landmark vector dim: {model_input_dim}")
+    else:
+        model_input_dim = None
+        print(f"Model expects image input shape: {in_shape}")
+    INPUT_BUF = np.zeros((MAX_BATCH_SIZE, model_input_dim or 126), dtype=np.float32)
+    if interpreter is not None:
+        if is_landmark:
+            # one fixed [MAX_BATCH_SIZE, D] input: tensors are planned (and XNNPACK applied) once,
+            # each call runs the whole buffer and only the first n output rows are read
+            interpreter.resize_tensor_input(input_index, list(INPUT_BUF.shape))
+            interpreter.allocate_tensors()
+        else:
+            interpreter = None
+    if interpreter is None and is_landmark:
+        # XLA compiles per input shape: compile every batch bucket up front
+        for m in xla_batch_buckets():
+            predict_fn(INPUT_BUF[:m])
+        print("Compiled Keras model with XLA.")
+    # labels
+    if not os.path.exists(LABELS_PATH):
+        raise FileNotFoundError(f"labels.json not found at {LABELS_PATH}")
+    labels_list = load_labels(LABELS_PATH)
+    print(f"Loaded {len(labels_list)} labels.")
+    return model, labels_list
+
+# load at startup
+try:
+    model, labels = load_model_and_labels()
+except Exception as e:
+    print("Error loading model or labels:", e)
+    model = None
+    labels = []
+
+def run_model(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run inference on the first n rows of INPUT_BUF (caller holds inference_lock).
+    Returns (best class index (n,), confidence (n,)); argmax is read straight from the
+    TFLite output tensor view / tf.function output, bypassing model.predict.
+    """
+    if interpreter is not None:
+        interpreter.set_tensor(input_index, INPUT_BUF)
+        interpreter.invoke()
+        # view into the interpreter's output buffer, valid until the next invoke;
+        # rows past n hold stale/padding inputs and are ignored
+        preds = interpreter.tensor(output_index)()[:n]
+        idx = preds.argmax(axis=1)
+        return idx, preds[np.arange(len(idx)), idx]
+    # round up to a precompiled XLA batch bucket; extra rows are ignored
+    m = next(b for b in xla_batch_buckets() if b >= n)
+    preds = predict_fn(INPUT_BUF[:m]).numpy()[:n]
+    idx = preds.argmax(axis=1)
+    return idx, preds[np.arange(len(idx)), idx]
+
+def classify(rows: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Copy up to MAX_BATCH_SIZE float32 feature rows into INPUT_BUF (zero-padded /
+    truncated to the model dim) and run one model call over them.
+    Returns (best class index, confidence) arrays, one entry per row.
+    """
+    with inference_lock:
+        X = INPUT_BUF[:len(rows)]
+        X.fill(0)
+        for row, feats in zip(X, rows):
+            src = feats[:X.shape[1]]
+            row[:src.size] = src
+        return run_model(len(rows))
+
+# -------------------------
+# Landmark extraction / normalization
+# -------------------------
+def normalize_landmarks(arr: np.ndarray) -> np.ndarray:
+    """
+    arr: float32 (21, 3) landmarks for one hand, normalized in place:
+    translate so wrist (index 0) at origin, scale by max L2 distance
+    returns flattened (63,) view
+    """
+    arr -= arr[0]
+    max_dist = np.sqrt(np.einsum('ij,ij->i', arr, arr).max())
+    if max_dist > 0:
+        arr *= 1.0 / max_dist
+    return arr.ravel()
+
+_rgb_buf = threading.local()
+
+def extract_hand_landmarks_from_image_bgr(image_bgr: np.ndarray, client_id: str = None):
+    """
+    Process a BGR image (OpenCV) with MediaPipe.
+    With a client_id the client's video-mode (tracking) instance is used,
+    otherwise the shared static_image mode instance.
+    Returns float32 (126,) features or None if no hands detected.
+    """
+    # convert into a reusable per-thread buffer instead of allocating HxWx3 per call
+    image_rgb = getattr(_rgb_buf, "b", None)
+    if image_rgb is None or image_rgb.shape != image_bgr.shape:
+        image_rgb = np.empty_like(image_bgr)
+        _rgb_buf.b = image_rgb
+    cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB, dst=image_rgb)
+    if client_id is None:
+        with hands_lock:
+            results = hands.process(image_rgb)
+    else:
+        while True:
+            entry = get_client_hands(client_id)
+            with entry["lock"]:
+                if not entry["closed"]:
+                    results = entry["hands"].process(image_rgb)
+                    break
+            # evicted/swept between lookup and lock; fetch the client's current entry
+    if not results.multi_hand_landmarks:
+        return None, False  # no hands detected
+
+    # always produce 126 features by default: [left (63) | right (63)], missing hand stays zero
+    feats = np.zeros(126, dtype=np.float32)
+    per_hand = feats.reshape(2, 21, 3)  # views: [0] left, [1] right
+    for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
+        label = handedness.classification[0].label  # "Left" or "Right"
+        arr = per_hand[0 if label == "Left" else 1]
+        # fill straight from the protobuf fields, then normalize in place
+        for i, lm in enumerate(hand_landmarks.landmark):
+            arr[i] = (lm.x, lm.y, lm.z)
+        normalize_landmarks(arr)
+
+    # If model expects 63, select_model_features picks the "bigger" hand
+    return feats, True
+
+def select_model_features(feats: np.ndarray) -> np.ndarray:
+    """
+    View of the (126,) features to feed the model: the hand with more non-zero
+    values when the model expects 63, otherwise all of them (padded/truncated in classify).
+    """
+    if model_input_dim == 63:
+        # one pass over both hands; left wins ties
+        nz = np.count_nonzero(feats.reshape(2, 63), axis=1)
+        start = 63 * int(nz[1] > nz[0])
+        return feats[start:start + 63]
+    return feats
+
+def warmup():
+    """
+    Push a black frame through the static MediaPipe instance and a throwaway video-mode
+    tracker (loading the tracking graph's models once), and run the model at every
+    batch shape run_model uses, so no first request pays lazy initialization. Never raises.
+    """
+    try:
+        extract_hand_landmarks_from_image_bgr(WARMUP_FRAME)
+        entry = new_client_hands_entry()
+        try:
+            entry["hands"].process(WARMUP_FRAME)
+        finally:
+            close_hands_entry(entry)
+        if model is not None:
+            # TFLite always runs the full (MAX_BATCH_SIZE, D) input; XLA runs per bucket
+            sizes = [MAX_BATCH_SIZE] if interpreter is not None else xla_batch_buckets()
+            zero_row = np.zeros(model_input_dim or 126, dtype=np.float32)
+            for n in sizes:
+                classify([zero_row] * n)
+        print("Warmed up MediaPipe and model.")
+    except Exception as e:
+        print("[WARN] Warmup failed:", e)
+
+warmup()
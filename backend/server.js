@@ -128,7 +128,7 @@ app.post('/api/predict-sign', async (req, res) => {
     const now = Date.now();
     if (now - lastErrorLogTime > ERROR_LOG_INTERVAL) {
       console.warn('⚠️  Sign language service unavailable:', error.message);
-      console.warn('   Make sure to start the Python service: python backend/sign_language_service.py');
+      console.warn('   Make sure to start the Python service: python backend/app.py');
       lastErrorLogTime = now;
     }
     
@@ -272,6 +272,6 @@ server.listen(SERVER_PORT, SERVER_HOST, () => {
   console.log(`📡 Sign language service: ${SIGN_LANGUAGE_SERVICE_URL}`);
   console.log(`   Status: ${signLanguageServiceAvailable ? '✅ Available' : '❌ Not available'}`);
   if (!signLanguageServiceAvailable) {
-    console.log(`   To enable sign language recognition, run: python backend/sign_language_service.py`);
+    console.log(`   To enable sign language recognition, run: python backend/app.py`);
   }
 });